@@ -0,0 +1,466 @@
+"""
+The Pulsar class and helper functions for reading and writing the LWA pulsar
+monitoring database.
+"""
+
+import os
+import mmap
+import stat
+import ephem
+import numpy
+import shutil
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from lsl import astro
+from lsl.common.stations import lwa1
+from lsl.common.mcs import mjdmpm_to_datetime as mjd2dt, datetime_to_mjdmpm as dt2mjd
+
+
+# Pulsar catalog location
+_CATALOG_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Pulsar_Catalog.txt')
+
+# Pulsar catalog entry format - name, RA, dec, duration, cadence, and last MJD.
+# The text fields are objects so that they are never truncated.
+_CATALOG_LINE_FORMAT = "%-10s  %-11s  %-11s  %-3.1f  %-2i  %-5i"
+_CATALOG_DTYPE = [('name', object), ('ra', object), ('dec', object),
+                  ('duration', 'f8'), ('cadence', 'i4'), ('mjd', 'i4')]
+
+
+# Linux ioctl request for cloning a file's extents (FICLONE in linux/fs.h)
+_FICLONE = 0x40049409
+
+
+# Pulsar catalog header - the only field is the UTC time of the update
+_CATALOG_HEADER = """############################################
+#                                          #
+# Columns:                                 #
+#   1. Name                                #
+#   2. RA - HH:MM:SS.SS - J2000            #
+#   3. Declination - sDD:MM:SS.S - J2000   #
+#   4. Observation Duration - hours        #
+#   5. Observing Cadence - days            #
+#   6. Last MJD Observed                   #
+#                                          #
+# Updated:                                 #
+#   %s UTC                #
+#                                          #
+############################################
+"""
+
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def _datetime_to_ephem(dt):
+    """
+    Convert a naive UTC datetime instance into an ephem.Date, dropping any
+    fractional seconds.
+    """
+    
+    return ephem.Date((dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second))
+
+
+@lru_cache(maxsize=1024)
+def _cached_dt2mjd(dt):
+    """
+    Cached version of datetime_to_mjdmpm that returns a two-element tuple of
+    (MJD, MPM) for a datetime instance.
+    """
+    
+    return dt2mjd(dt)
+
+
+@lru_cache(maxsize=1024)
+def _cached_mjd2dt(mjd_us):
+    """
+    Cached version of mjdmpm_to_datetime that takes a fractional MJD expressed
+    as an integer number of microseconds and returns a datetime instance.
+    """
+    
+    return mjd2dt(mjd_us / 86400e6, 0)
+
+
+@lru_cache(maxsize=4096)
+def _cached_next_transit(date, lat, lon, elevation, ra, dec):
+    """
+    Given an observer date, location, and a J2000 RA/dec pair (all as floats),
+    return the date of the next transit of that position as an ephem DJD.
+    """
+    
+    obs = ephem.Observer()
+    obs.lat, obs.lon, obs.elevation = lat, lon, elevation
+    obs.date = date
+    bdy = ephem.FixedBody()
+    bdy._ra, bdy._dec, bdy._epoch = ra, dec, ephem.J2000
+    bdy.compute(obs)
+    return float(obs.next_transit(bdy))
+
+
+class Pulsar(ephem.FixedBody):
+    """
+    Wrapper around the ephem.FixedBody class to allow us to add in custom attributes
+    and a few helper methods for determining when things can be observed.
+    """
+    
+    __slots__ = ('obs', 'duration', 'cadence', 'last_mjd', 'final', 'final_ns', 'beams',
+                 'transit_unix', '_transit_start', '_cached_start_stop',
+                 '_ra_rad', '_dec_rad')
+    
+    _padding = 10    # total session padding time in seconds
+    
+    _horizon_margin = 0.01    # margin in radians when checking if a target never rises
+    
+    def __init__(self):
+        super().__init__()
+        self.obs = lwa1.get_observer()    # defaults to LWA1
+        self.transit_unix = None
+        self._transit_start = None
+        self._cached_start_stop = {}
+        
+    @classmethod
+    def from_line(cls, line):
+        """
+        Return a new Pulsar instance generated from a line in the catalog file.
+        """
+        
+        name, ra, dec, duration, cadence, mjd = line.split(None, 5)
+        bdy = cls()
+        bdy.name = name
+        bdy._ra = ra
+        bdy._dec = dec
+        bdy._epoch = ephem.J2000
+        bdy._ra_rad = float(bdy._ra)
+        bdy._dec_rad = float(bdy._dec)
+        bdy.duration = float(duration)*3600.0
+        bdy.cadence = int(cadence, 10)
+        bdy.last_mjd = int(mjd, 10)
+        return bdy
+        
+    @classmethod
+    def _from_row(cls, row):
+        """
+        Return a new Pulsar instance generated from an already parsed catalog
+        entry of (name, RA, dec, duration, cadence, last MJD).
+        """
+        
+        name, ra, dec, duration, cadence, mjd = row
+        bdy = cls()
+        bdy.name = name
+        bdy._ra = ra
+        bdy._dec = dec
+        bdy._epoch = ephem.J2000
+        bdy._ra_rad = float(bdy._ra)
+        bdy._dec_rad = float(bdy._dec)
+        bdy.duration = duration*3600.0
+        bdy.cadence = cadence
+        bdy.last_mjd = mjd
+        return bdy
+        
+    def to_line(self):
+        """
+        Return a text string that is the same format as the catalog file.
+        """
+        
+        dec = self._dec
+        return _CATALOG_LINE_FORMAT % (self.name, 
+                                       self._ra, 
+                                       dec if dec < 0 else '+'+str(dec),
+                                       self.duration/3600.,
+                                       self.cadence, 
+                                       self.last_mjd)
+        
+    def to_file(self, fh):
+        """
+        Similar to to_line(), but writes to an open file handle.
+        """
+        
+        if not hasattr(fh, 'write'):
+            raise TypeError("Expected an open filehandle")
+        fh.write("%s\n" % self.to_line())
+        
+    def within_beam(self, other, width_deg=1.5):
+        """
+        Given an ephem.FixedBody or another Pulsar instance, determin if the other
+        target is within the beam of the first target.
+        """
+        
+        if not isinstance(other, (ephem.Body, ephem.FixedBody, Pulsar)):
+            raise TypeError("Expected a ephem.Body, ephem.FixedBody, or Pulsar instance")
+                
+        width = ephem.degrees(width_deg*numpy.pi/180)
+        try:
+            sep = ephem.separation((self._ra,self._dec), (other.ra,other.dec))
+        except (RuntimeError, AttributeError):
+            sep = ephem.separation((self._ra,self._dec), (other._ra,other._dec))
+        if sep <= width:
+            return True
+        return False
+        
+    @classmethod
+    def bulk_within_beam(cls, target_ra, target_dec, ra_arr, dec_arr, width_rad):
+        """
+        Vectorized version of within_beam() that works on J2000 coordinates in
+        radians.  Given the RA and dec. of a target and arrays of RA and dec.
+        for other targets, return a boolean mask of which of the other targets
+        are within width_rad of the first target.
+        """
+        
+        ra_arr = numpy.asarray(ra_arr, dtype=numpy.float64)
+        dec_arr = numpy.asarray(dec_arr, dtype=numpy.float64)
+        
+        # Haversine formula for the great circle distance
+        hav = numpy.sin((dec_arr - target_dec)/2)**2 \
+              + numpy.cos(target_dec)*numpy.cos(dec_arr)*numpy.sin((ra_arr - target_ra)/2)**2
+        sep = 2*numpy.arcsin(numpy.sqrt(numpy.clip(hav, 0, 1)))
+        return sep <= width_rad
+        
+    def set_observer(self, obs):
+        """
+        Update the ephem.Observer used for this object.
+        """
+        
+        if not isinstance(obs, ephem.Observer):
+            raise TypeError("Expected an ephem.Observer instance")
+        
+        self.obs = obs
+        self._cached_start_stop.clear()
+        
+    def get_start_stop(self, start, stop, padding=True):
+        """
+        Given a start datetime instance and a stop datetime instance, determine
+        when the target should be observed based on its transit time and 
+        required observation duration.  Results are cached on the start, stop,
+        and padding values.
+        """
+        
+        if not isinstance(start, datetime):
+            raise TypeError("Expected start to be a datetime instance")
+        if not isinstance(stop, datetime):
+            raise TypeError("Expected stop to be a datetime instance")
+            
+        key = (start, stop, padding)
+        try:
+            return self._cached_start_stop[key]
+        except KeyError:
+            pass
+            
+        # Get the transit time, using the value from compute_transits() if we can
+        if self._transit_start == start:
+            bdy_transit = _UNIX_EPOCH + timedelta(seconds=self.transit_unix)
+        else:
+            bdy_transit = _cached_next_transit(float(_datetime_to_ephem(start)),
+                                               float(self.obs.lat), float(self.obs.lon), self.obs.elevation,
+                                               float(self._ra), float(self._dec))
+            bdy_transit = _cached_mjd2dt(int(round((bdy_transit + (astro.DJD_OFFSET - astro.MJD_OFFSET))*86400e6)))
+        # Round to the nearest second
+        bdy_transit = (bdy_transit + timedelta(microseconds=500000)).replace(microsecond=0)
+        # Compute the start and stop times to center on transit
+        bdy_start = bdy_transit - timedelta(seconds=self.duration/2.0)
+        bdy_stop  = bdy_transit + timedelta(seconds=self.duration/2.0)
+        if padding:
+            # Add in the session padding, if needed
+            bdy_start -= timedelta(seconds=self._padding/2.0)
+            bdy_stop  += timedelta(seconds=self._padding/2.0)
+        self._cached_start_stop[key] = (bdy_start, bdy_stop)
+        return bdy_start, bdy_stop
+        
+    def can_run(self, start, stop):
+        """
+        Given a start datetime instance and a stop datetime instance, determine
+        if the target can be observed within that window.
+        """
+        
+        # Skip targets that never rise without calling ephem
+        lat = float(self.obs.lat)
+        if self._dec_rad < lat - numpy.pi/2 - self._horizon_margin \
+           or self._dec_rad > lat + numpy.pi/2 + self._horizon_margin:
+            return False
+            
+        bdy_start, bdy_stop = self.get_start_stop(start, stop, padding=True)
+        if bdy_start >= start and bdy_stop <= stop:
+            return True
+        return False
+            
+    def should_run(self, start, stop):
+        """
+        Given a start datetime instance and a stop datetime instance, determine
+        if the target should be observed given the last time it was observed.
+        """
+        
+        obs_mjd_start, _ = _cached_dt2mjd(start)
+        if obs_mjd_start >= (self.last_mjd + self.cadence) and self.cadence > 0:
+            return True
+        return False
+
+
+def _catalog_entries(lines):
+    """
+    Given an iterable of lines, as bytes, from a catalog file, yield the entries
+    in it.  Lines starting with '#' are comments and lines shorter than three
+    characters once stripped are skipped.
+    """
+    
+    for line in lines:
+        if line[:1] == b'#':
+            continue
+        line = line.strip()
+        if len(line) < 3:
+            continue
+        yield line
+
+
+def _read_catalog(path):
+    """
+    Read the catalog file at the given path and return its entries as a NumPy
+    structured array with the fields in _CATALOG_DTYPE.  This is the parser
+    used by both load_catalog() and the scheduler.
+    """
+    
+    with open(path, 'rb') as fh:
+        lines = []
+        if os.fstat(fh.fileno()).st_size > 0:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = list(_catalog_entries(iter(mm.readline, b'')))
+    if not lines:
+        return numpy.empty(0, dtype=_CATALOG_DTYPE)
+    return numpy.loadtxt(lines, dtype=_CATALOG_DTYPE, comments=None, encoding='utf-8', ndmin=1)
+
+
+@lru_cache(maxsize=8)
+def _parse(path, mtime_ns, size):
+    """
+    Parse the catalog file at the given path and return a two-element tuple of
+    (tuple of (name, RA, dec, duration, cadence, last MJD) entries sorted by RA,
+    dictionary mapping names to indices).  The modification time and size of
+    the file are part of the cache key so that changes to the file on disk
+    invalidate any previously parsed version.
+    """
+
+    ## Read and parse
+    rows = _read_catalog(path).tolist()
+    ## Sort by RA
+    rows.sort(key=lambda x:float(ephem.hours(x[1])))
+    ## Index
+    name_index = {row[0]: i for i,row in enumerate(rows)}
+    return tuple(rows), name_index
+
+
+def load_catalog(path):
+    """
+    Load the pulsar catalog at the given path and return a two-element tuple of
+    (list of Pulsar instances sorted by RA, dictionary mapping pulsar names to
+    their index in that list).  Parsed catalogs are cached on the file's path,
+    modification time, and size so that repeated loads of an unchanged file are
+    cheap.  The Pulsar instances are new for every call so changes made to them
+    by one caller are not seen by others.
+    """
+
+    st = os.stat(path)
+    rows, name_index = _parse(path, st.st_mtime_ns, st.st_size)
+    _from_row = Pulsar._from_row
+    return [_from_row(row) for row in rows], dict(name_index)
+
+
+def write_catalog(path, bdys, backup=False):
+    """
+    Write a list of Pulsar instances out to the catalog at the given path.  The
+    new catalog is built in memory and written to a temporary file which then
+    replaces the original so that a partially written catalog is never left
+    behind.  The new file keeps the permissions and owner of the original.  If
+    the entries are the same as what is already on disk nothing is written.
+    If backup is True the current catalog is saved to '<path>.old' just before
+    it is replaced.  Returns True if the catalog was written, False otherwise.
+    """
+
+    ## Build
+    body = ''.join([bdy.to_line()+'\n' for bdy in bdys])
+    
+    ## Check for changes
+    try:
+        with open(path, 'r') as fh:
+            current = ''.join([line for line in fh if line[:1] != '#'])
+        if current == body:
+            return False
+    except IOError:
+        pass
+        
+    ## Write, keeping the permissions and, if we can, the owner of the current
+    ## catalog
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    buf = _CATALOG_HEADER % datetime.now(timezone.utc).strftime('%Y/%m/%d %H:%M:%S')
+    buf = memoryview((buf + body).encode())
+    tmpname = path+'.tmp'
+    fd = os.open(tmpname, os.O_WRONLY|os.O_CREAT|os.O_TRUNC, 0o644)
+    try:
+        try:
+            if st is not None:
+                os.fchmod(fd, stat.S_IMODE(st.st_mode))
+                try:
+                    os.fchown(fd, st.st_uid, st.st_gid)
+                except OSError:
+                    pass
+            while buf:
+                buf = buf[os.write(fd, buf):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except Exception:
+        try:
+            os.unlink(tmpname)
+        except OSError:
+            pass
+        raise
+    if backup and st is not None:
+        _backup_catalog(path)
+    os.replace(tmpname, path)
+    return True
+
+
+def _backup_catalog(path):
+    """
+    Save a copy of the catalog at the given path to '<path>.old'.  The copy is
+    made by cloning the file on filesystems that support reflinks, then by hard
+    linking it, and then by falling back to a regular copy.  Hard linking is
+    only safe because this is called by write_catalog() right before the
+    catalog is replaced with a new file.
+    """
+    
+    backup = path+'.old'
+    tmpname = backup+'.tmp'
+    
+    ## Clone
+    if fcntl is not None:
+        try:
+            with open(path, 'rb') as src:
+                with open(tmpname, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            os.replace(tmpname, backup)
+            return
+        except OSError:
+            try:
+                os.unlink(tmpname)
+            except OSError:
+                pass
+                
+    ## Link
+    try:
+        if os.path.exists(backup) and os.path.samefile(path, backup):
+            # Already a link to the current catalog
+            return
+        os.link(path, tmpname)
+        os.replace(tmpname, backup)
+        return
+    except OSError:
+        pass
+        
+    ## Copy
+    shutil.copy(path, backup)
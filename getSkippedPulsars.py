@@ -1,62 +1,15 @@
 #!/usr/bin/env python3
 
 """
-Script to help manage the LWA pulsar monitoring database.
+Script to help manage the LWA pulsar monitoring database.  This is a wrapper
+around the 'skipped' command of pulsar_db.py.
 """
 
-import os
 import sys
-import time
-import ephem
-import numpy
-import shutil
-import argparse
-from datetime import datetime
 
-from lsl.common.mcs import datetime_to_mjdmpm as dt2mjd
+from pulsar_db import build_parser, main
 
-from runPulsarMonitoring import _CATALOG_FILENAME, Pulsar
-
-
-def main(args):
-    # Get the current MJD
-    mjd, _ = dt2mjd(datetime.utcnow())
-    
-    # Load in the target list
-    ## Read
-    fh = open(_CATALOG_FILENAME, 'r')
-    lines = fh.readlines()
-    fh.close()
-    ## Parse
-    bdys = []
-    for line in lines:
-        line = line.strip().rstrip()
-        if line[0] == '#':
-            continue
-        elif len(line) < 3:
-            continue
-        bdy = Pulsar.from_line(line)
-        bdys.append(bdy)
-        
-    # Search for missed pulsars
-    missed = []
-    for bdy in bdys:
-        if bdy.cadence < 0:
-            continue 
-        if mjd - bdy.last_mjd > 1.9*bdy.cadence:
-            missed.append(bdy)
-            
-    # Sort by "level of egregiousness" and report
-    missed.sort(key=lambda x: (mjd-x.last_mjd)/x.cadence)
-    missed.reverse()
-    for bdy in missed:
-        print("%s was last observed %i days (%i cycles) ago on %i" % (bdy.name,
-                                                                      mjd-bdy.last_mjd,
-                                                                      (mjd-bdy.last_mjd)/bdy.cadence,
-                                                                      bdy.last_mjd))
-    
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='List pulsars that have not been observed for more than one cadence period')
-    args = parser.parse_args()
+    args = build_parser().parse_args(['skipped',]+sys.argv[1:])
     main(args)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+"""
+Script to help manage the LWA pulsar monitoring database.
+"""
+
+import os
+import sys
+import json
+import ephem
+import numpy
+import argparse
+from bisect import insort
+from datetime import datetime, timezone
+
+from lsl.common.mcs import datetime_to_mjdmpm as dt2mjd
+
+from catalog_io import _CATALOG_FILENAME, Pulsar, load_catalog, write_catalog
+from runPulsarMonitoring import _PROJECT_ID
+
+
+try:
+    raw_input
+except NameError:
+    raw_input = input
+
+
+def _reindex(bdys, name_index):
+    """
+    Rebuild a name-to-index dictionary in place after the list of Pulsar
+    instances it refers to has changed.
+    """
+
+    name_index.clear()
+    name_index.update({bdy.name: i for i,bdy in enumerate(bdys)})
+
+
+def cmd_add(args, catalog=None):
+    """
+    Add a pulsar to the database.  If a catalog, as returned by load_catalog(),
+    is provided it is updated in place and not written out.
+    """
+
+    # Load in the target list
+    write = catalog is None
+    if write:
+        catalog = load_catalog(_CATALOG_FILENAME)
+    bdys, name_index = catalog
+
+    # Prompts
+    if not args.name:
+        args.name = raw_input('name? ')
+    if not args.ra:
+        args.ra = raw_input('RA [HH:MM:SS.SS; J2000]? ')
+    args.ra = ephem.hours(args.ra)
+    if not args.dec:
+        args.dec = raw_input('Dec [sDD:MM:SS.S; J2000]? ')
+    args.dec = ephem.degrees(args.dec)
+    if args.duration is None:
+        args.duration = raw_input('observation duration [hr]? ')
+        args.duration = float(args.duration)
+    if args.cadence is None:
+        args.cadence = raw_input('observing cadence [day]? ')
+        args.cadence = int(args.cadence, 10)
+    new_bdy = Pulsar.from_line("%s %s %s %s %s 0" % (args.name, args.ra, args.dec, args.duration, args.cadence))
+
+    # Make sure it isn't already in there
+    idx = name_index.get(new_bdy.name)
+    if idx is not None:
+        raise RuntimeError("'%s' appears to already be in the database" % args.name)
+
+    # One more prompt
+    print("Name: %s" % new_bdy.name)
+    print("  RA: %s" % new_bdy._ra)
+    print("  Dec: %s" % new_bdy._dec)
+    print("  Duration: %.3f hr" % (new_bdy.duration/3600.0,))
+    print("  Cadence: every %i days" % new_bdy.cadence)
+    if args.force:
+        yn = 'y'
+    else:
+        yn = raw_input('add? ')
+    if yn.lower() in ('y', 'yea', 'yes'):
+        ## Insert
+        insort(bdys, new_bdy, key=lambda x:x._ra)
+        _reindex(bdys, name_index)
+
+        ## Write out the new version
+        if write:
+            write_catalog(_CATALOG_FILENAME, bdys)
+
+        ## Reminder
+        print("")
+        print("NOTE: Please remember to make the following directory on the UCF:")
+        print("      /data/network/recent_data/pulsar/%s/%s" % (_PROJECT_ID, args.name))
+
+
+def cmd_remove(args, catalog=None):
+    """
+    Remove a pulsar from the database.  If a catalog, as returned by
+    load_catalog(), is provided it is updated in place and not written out.
+    """
+
+    # Load in the target list
+    write = catalog is None
+    if write:
+        catalog = load_catalog(_CATALOG_FILENAME)
+    bdys, name_index = catalog
+
+    # Find the entry to remove
+    idx = name_index.get(args.name)
+    if idx is None:
+        raise RuntimeError("Cannot find pulsar '%s' in the database" % args.name)
+
+    # Prompt
+    if args.force:
+        yn = 'y'
+    else:
+        yn = raw_input('remove %s (entry #%i)? ' % (args.name, idx))
+    if yn.lower() in ('y', 'yea', 'yes'):
+        ## Remove
+        del bdys[idx]
+        _reindex(bdys, name_index)
+
+        ## Backup the catalog and write out the new version
+        if write:
+            write_catalog(_CATALOG_FILENAME, bdys, backup=True)
+
+
+def cmd_skipped(args, catalog=None):
+    """
+    List pulsars that have not been observed for more than one cadence period.
+    """
+
+    # Get the current MJD
+    mjd, _ = dt2mjd(datetime.now(timezone.utc))
+
+    # Load in the target list
+    if catalog is None:
+        catalog = load_catalog(_CATALOG_FILENAME)
+    bdys, _ = catalog
+
+    last_mjd = numpy.fromiter((bdy.last_mjd for bdy in bdys), dtype=numpy.int64, count=len(bdys))
+    cadence = numpy.fromiter((bdy.cadence for bdy in bdys), dtype=numpy.int64, count=len(bdys))
+
+    # Search for missed pulsars
+    delta = mjd - last_mjd
+    valid = cadence > 0
+    missed = numpy.where(valid & (delta > 1.9*cadence))[0]
+
+    # Sort by "level of egregiousness" and report
+    ratio = delta[missed] / cadence[missed]
+    order = numpy.argsort(ratio, kind='stable')[::-1]    # descending as a view
+    for i,r in zip(missed[order], ratio[order]):
+        print("%s was last observed %i days (%i cycles) ago on %i" % (bdys[i].name,
+                                                                      delta[i],
+                                                                      r,
+                                                                      last_mjd[i]))
+
+
+def cmd_reset(args, catalog=None):
+    """
+    Reset the MJD last observed for a pulsar.  If a catalog, as returned by
+    load_catalog(), is provided it is updated in place and not written out.
+    """
+
+    # Load in the target list
+    write = catalog is None
+    if write:
+        catalog = load_catalog(_CATALOG_FILENAME)
+    bdys, name_index = catalog
+
+    # Load in the backup list, if it exists
+    backup_filename = _CATALOG_FILENAME+'.old'
+    old_bdys, old_name_index = [], {}
+    if os.path.exists(backup_filename):
+        old_bdys, old_name_index = load_catalog(backup_filename)
+
+    # Find the entry to reset in both catalogs
+    idx = name_index.get(args.name)
+    if idx is None:
+        raise RuntimeError("Cannot find pulsar '%s' in the database" % args.name)
+    old_idx = old_name_index.get(args.name)
+
+    # Prompt
+    old_mjd = bdys[idx].last_mjd
+    if args.mjd is not None:
+        new_mjd = str(args.mjd)
+    elif old_idx is not None and old_bdys[old_idx].last_mjd < bdys[idx].last_mjd:
+        new_mjd = str(old_bdys[old_idx].last_mjd)
+    else:
+        new_mjd = raw_input('new MJD for last run date for %s? ' % (args.name))
+    new_mjd = int(new_mjd, 10)
+    if new_mjd == old_mjd:
+        print("Last run date for %s is already %i, nothing to change" % (args.name, old_mjd))
+        return
+
+    if getattr(args, 'force', False):
+        yn = 'y'
+    else:
+        yn = raw_input('change last run date for %s from %i to %i? ' % (args.name, old_mjd, new_mjd))
+    if yn.lower() in ('y', 'yea', 'yes'):
+        # Update
+        bdys[idx].last_mjd = new_mjd
+
+        # Write out the new version
+        if write:
+            write_catalog(_CATALOG_FILENAME, bdys)
+
+
+# Batch operations - command and required fields for each
+_BATCH_OPERATIONS = {'add':     (cmd_add,     ('name', 'ra', 'dec', 'duration', 'cadence')),
+                     'remove':  (cmd_remove,  ('name',)),
+                     'skipped': (cmd_skipped, ()),
+                     'reset':   (cmd_reset,   ('name', 'mjd'))}
+
+
+def cmd_batch(args, catalog=None):
+    """
+    Apply a series of operations read from standard input as JSON lines, e.g.,
+      {"op": "reset", "name": "B0329+54", "mjd": 60214}
+    The operations are applied to a single copy of the catalog, without
+    prompting, and the catalog is written out once at the end.
+    """
+
+    # Load in the target list
+    write = catalog is None
+    if write:
+        catalog = load_catalog(_CATALOG_FILENAME)
+    bdys, _ = catalog
+
+    # Process the operations
+    backup = False
+    for lineno,line in enumerate(sys.stdin, 1):
+        line = line.strip()
+        if len(line) == 0 or line[0] == '#':
+            continue
+        try:
+            op = json.loads(line)
+        except ValueError:
+            raise RuntimeError("Line %i of the batch input is not valid JSON" % lineno)
+        if not isinstance(op, dict):
+            raise RuntimeError("Line %i of the batch input is not a JSON object" % lineno)
+        try:
+            opname = op.pop('op')
+            func, required = _BATCH_OPERATIONS[opname]
+        except KeyError:
+            raise RuntimeError("Unknown or missing operation on line %i of the batch input" % lineno)
+        missing = [field for field in required if op.get(field, None) is None]
+        if missing:
+            raise RuntimeError("Operation '%s' on line %i is missing: %s" % (opname, lineno, ', '.join(missing)))
+        op['force'] = True
+        func(argparse.Namespace(**op), catalog=catalog)
+        backup |= (opname == 'remove')
+
+    # Backup the catalog, if needed, and write out the new version
+    if write:
+        write_catalog(_CATALOG_FILENAME, bdys, backup=backup)
+
+
+def build_parser():
+    """
+    Build and return the command line parser for all of the commands.  This is
+    shared by pulsar_db.py and the single command wrapper scripts.
+    """
+    
+    parser = argparse.ArgumentParser(description='Manage the LWA pulsar monitoring database')
+    subparsers = parser.add_subparsers(title='commands', dest='command')
+    subparsers.required = True
+    ## add
+    sp = subparsers.add_parser('add', help='add a pulsar to the LWA pulsar monitoring observations')
+    sp.add_argument('-n', '--name', type=str,
+                    help='pulsar name')
+    sp.add_argument('-r', '--ra', type=str,
+                    help='RA [HH:MM:SS.SS, J2000]')
+    sp.add_argument('-d', '--dec', type=str,
+                    help='declination [sDD:MM:SS.S; J2000]')
+    sp.add_argument('-l', '--duration', type=float,
+                    help='observation duration [hr]')
+    sp.add_argument('-c', '--cadence', type=int,
+                    help='observing cadence [days]')
+    sp.add_argument('-f', '--force', action='store_true',
+                    help='do not prompt for confirmation')
+    sp.set_defaults(func=cmd_add)
+    ## remove
+    sp = subparsers.add_parser('remove', help='remove a pulsar from the LWA pulsar monitoring observations')
+    sp.add_argument('name', type=str,
+                    help='pulsar name')
+    sp.add_argument('-f', '--force', action='store_true',
+                    help='do not prompt for confirmation')
+    sp.set_defaults(func=cmd_remove)
+    ## skipped
+    sp = subparsers.add_parser('skipped', help='list pulsars that have not been observed for more than one cadence period')
+    sp.set_defaults(func=cmd_skipped)
+    ## reset
+    sp = subparsers.add_parser('reset', help='reset the MJD last observed for a pulsar')
+    sp.add_argument('name', type=str,
+                    help='pulsar name')
+    sp.add_argument('-m', '--mjd', type=int,
+                    help='MJD to reset the last run date to')
+    sp.add_argument('-f', '--force', action='store_true',
+                    help='do not prompt for confirmation')
+    sp.set_defaults(func=cmd_reset)
+    ## batch
+    sp = subparsers.add_parser('batch', help='apply operations read from stdin as JSON lines and write the database once')
+    sp.set_defaults(func=cmd_batch)
+    return parser
+
+
+def main(args):
+    args.func(args)
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    main(args)
@@ -6,29 +6,30 @@ Script to help schedule LWA pulsar monitoring observations during idle windows.
 
 import os
 import sys
-import time
 import ephem
 import numpy
-import shutil
 import argparse
 import subprocess
-from io import IOBase
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import pytz
 
-from lsl import astro
 from lsl.common import busy
 from lsl.common.stations import lwa1
 from lsl.common import sdf as lslsdf
-from lsl.common.mcs import mjdmpm_to_datetime as mjd2dt, datetime_to_mjdmpm as dt2mjd
 
 from lwa_mcs.tp import schedule_sdfs
 from lwa_mcs.utils import schedule_at_command
 from lwa_mcs.exc import cancel_observation
 
+from catalog_io import _CATALOG_FILENAME, _UNIX_EPOCH, \
+                       _datetime_to_ephem, _cached_dt2mjd, Pulsar, \
+                       _read_catalog, write_catalog
 
-# Pulsar catalog location
-_CATALOG_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Pulsar_Catalog.txt')
+
+# Location of this script and its state and log files
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
 # Obsever and project information
@@ -41,136 +42,79 @@ _PROJECT_ID = 'LK018'
 UTC = pytz.utc
 
 
-class Pulsar(ephem.FixedBody):
+_SIDEREAL_RATE = 2*numpy.pi / 86164.0905    # rad/s
+
+
+def _datetime_to_ns(dt):
     """
-    Wrapper around the ephem.FixedBody class to allow us to add in custom attributes
-    and a few helper methods for determining when things can be observed.
+    Convert a naive UTC datetime instance into an integer number of nanoseconds
+    since the UNIX epoch.
     """
     
-    obs = lwa1.get_observer()    # defaults to LWA1
+    return (dt - _UNIX_EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _ns_to_datetime(ns):
+    """
+    Convert an integer number of nanoseconds since the UNIX epoch into a naive
+    UTC datetime instance.
+    """
     
-    _padding = 10    # total session padding time in seconds
-        
-    @classmethod
-    def from_line(cls, line):
-        """
-        Return a new Pulsar instance generated from a line in the catalog file.
-        """
-        
-        name, ra, dec, duration, cadence, mjd = line.split(None, 5)
-        bdy = cls()
-        bdy.name = name
-        bdy._ra = ra
-        bdy._dec = dec
-        bdy._epoch = ephem.J2000
-        bdy.duration = float(duration)*3600.0
-        bdy.cadence = int(cadence, 10)
-        bdy.last_mjd = int(mjd, 10)
-        return bdy
-        
-    def to_line(self):
-        """
-        Return a text string that is the same format as the catalog file.
-        """
-        
-        return "%-10s  %-11s  %-11s  %-3.1f  %-2i  %-5i" % (self.name, 
-                                                            self._ra, 
-                                                            self._dec if self._dec < 0 else '+'+str(self._dec),
-                                                            self.duration/3600.,
-                                                            self.cadence, 
-                                                            self.last_mjd)
-        
-    def to_file(self, fh):
-        """
-        Similar to to_line(), but writes to an open file handle.
-        """
-        
-        if not isinstance(fh, IOBase):
-            raise TypeError("Expected an open filehandle")
-        fh.write("%s\n" % self.to_line())
-        
-    def within_beam(self, other, width_deg=1.5):
-        """
-        Given an ephem.FixedBody or another Pulsar instance, determin if the other
-        target is within the beam of the first target.
-        """
-        
-        if not isinstance(other, (ephem.Body, ephem.FixedBody, Pulsar)):
-            raise TypeError("Expected a ephem.Body, ephem.FixedBody, or Pulsar instance")
-                
-        width = ephem.degrees(width_deg*numpy.pi/180)
-        try:
-            sep = ephem.separation((self._ra,self._dec), (other.ra,other.dec))
-        except (RuntimeError, AttributeError):
-            sep = ephem.separation((self._ra,self._dec), (other._ra,other._dec))
-        if sep <= width:
-            return True
-        return False
-        
-    def set_observer(self, obs):
-        """
-        Update the ephem.Observer used for this object.
-        """
-        
-        if not isinstance(obs, ephem.Observer):
-            raise TypeError("Expected an ephem.Observer instance")
-        
-        self.obs = obs
-        
-    def get_start_stop(self, start, stop, padding=True):
-        """
-        Given a start datetime instance and a stop datetime instance, determine
-        when the target should be observed based on its transit time and 
-        required observation duration.
-        """
-        
-        if not isinstance(start, datetime):
-            raise TypeError("Expected start to be a datetime instance")
-        if not isinstance(stop, datetime):
-            raise TypeError("Expected stop to be a datetime instance")
-        
-        self.obs.date = start.strftime('%Y/%m/%d %H:%M:%S')
-        self.compute(self.obs)
-        
-        # Get the transit time
-        bdy_transit = self.obs.next_transit(self)
-        bdy_transit = mjd2dt(bdy_transit + (astro.DJD_OFFSET - astro.MJD_OFFSET), 0)
-        # Round to the nearest second
-        if bdy_transit.microsecond >= 5000000:
-            bdy_transit += timedelta(seconds=1)
-        bdy_transit = bdy_transit.replace(microsecond=0)
-        # Compute the start and stop times to center on transit
-        bdy_start = bdy_transit - timedelta(seconds=self.duration/2.0)
-        bdy_stop  = bdy_transit + timedelta(seconds=self.duration/2.0)
-        if padding:
-            # Add in the session padding, if needed
-            bdy_start -= timedelta(seconds=self._padding/2.0)
-            bdy_stop  += timedelta(seconds=self._padding/2.0)
-        return bdy_start, bdy_stop
-        
-    def can_run(self, start, stop):
-        """
-        Given a start datetime instance and a stop datetime instance, determine
-        if the target can be observed within that window.
-        """
-        try:
-            bdy_start, bdy_stop = self.get_start_stop(start, stop, padding=True)
-            if bdy_start >= start and bdy_stop <= stop:
-                return True
-        except ephem.NeverUp:
-            pass
-        return False
-            
-    def should_run(self, start, stop):
-        """
-        Given a start datetime instance and a stop datetime instance, determine
-        if the target should be observed given the last time it was observed.
-        """
-        
-        obs_mjd_start, _ = dt2mjd(start)
-        if obs_mjd_start >= (self.last_mjd + self.cadence) and self.cadence > 0:
-            return True
-        return False
+    return _UNIX_EPOCH + timedelta(microseconds=ns // 1000)
+
+
+def _parse_date_time(date_str, time_str):
+    """
+    Convert a YYYY/MM/DD date string and a HH:MM:SS time string into a naive
+    datetime instance.
+    """
+    
+    year, month, day = date_str.split('/', 2)
+    hour, minute, second = time_str.split(':', 2)
+    return datetime(int(year, 10), int(month, 10), int(day, 10),
+                    int(hour, 10), int(minute, 10), int(second, 10))
+
+
+def compute_transits(bdys, start, obs):
+    """
+    Given a list of Pulsar instances, a start datetime instance, and an
+    ephem.Observer, compute the next transit after start for all of the targets
+    at once and save it to each target's 'transit_unix' attribute.  The transit
+    is estimated from the hour angle of the target's apparent RA at start and
+    the sidereal rate, and then refined with one more step using the LST and
+    apparent RA at the estimated transit.
+    """
+    
+    obs.date = _datetime_to_ephem(start)
+    lst_start = float(obs.sidereal_time())
+    
+    # Apparent RAs, found with a scratch body so the targets are left as-is
+    scratch = ephem.FixedBody()
+    scratch._epoch = ephem.J2000
+    ra = numpy.empty(len(bdys), dtype=numpy.float64)
+    for i,bdy in enumerate(bdys):
+        scratch._ra, scratch._dec = bdy._ra, bdy._dec
+        scratch.compute(obs)
+        ra[i] = scratch.ra
+    transit_unix = (start - _UNIX_EPOCH).total_seconds() \
+                   + numpy.mod(ra - lst_start, 2*numpy.pi) / _SIDEREAL_RATE
+                   
+    # Refine the estimates using the LST and apparent RA at each estimated transit
+    unix_djd = float(ephem.Date(_UNIX_EPOCH))
+    lst = numpy.empty(len(bdys), dtype=numpy.float64)
+    for i,bdy in enumerate(bdys):
+        obs.date = transit_unix[i]/86400.0 + unix_djd
+        lst[i] = obs.sidereal_time()
+        scratch._ra, scratch._dec = bdy._ra, bdy._dec
+        scratch.compute(obs)
+        ra[i] = scratch.ra
+    ha = numpy.mod(lst - ra + numpy.pi, 2*numpy.pi) - numpy.pi
+    transit_unix -= ha / _SIDEREAL_RATE
+    
+    for bdy,t in zip(bdys, transit_unix.tolist()):
+        bdy.transit_unix = t
+        bdy._transit_start = start
+        bdy._cached_start_stop.clear()
 
 
 _SPACE_CONVERSION_RATE = 19.6e6 / 4096 * 4128 * 2 * 2 * 2    # B/s for two pols, two tunings, and two beams
@@ -199,8 +143,8 @@ def get_available_space(user, buffer_factor=0.8, min_free_tb=2.0):
 
 def main(args):
     # Get the start and stop times for the window that we are scheduling
-    start = datetime.strptime('%s %s' % (args.start_date, args.start_time), '%Y/%m/%d %H:%M:%S')
-    stop  = datetime.strptime('%s %s' % (args.stop_date, args.stop_time), '%Y/%m/%d %H:%M:%S')
+    start = _parse_date_time(args.start_date, args.start_time)
+    stop  = _parse_date_time(args.stop_date, args.stop_time)
     print("Scheduling pulsar monitoring (%s) for %s to %s" % (_PROJECT_ID,
                                                               start.strftime('%Y/%m/%d %H:%M:%S'),  
                                                               stop.strftime('%Y/%m/%d %H:%M:%S')))
@@ -208,9 +152,9 @@ def main(args):
     
     # Get the observer and convert to LST
     obs = lwa1.get_observer()
-    obs.date = start.strftime('%Y/%m/%d %H:%M:%S')
+    obs.date = _datetime_to_ephem(start)
     lst_start = obs.sidereal_time()
-    obs.date = stop.strftime('%Y/%m/%d %H:%M:%S')
+    obs.date = _datetime_to_ephem(stop)
     lst_stop = obs.sidereal_time()
     print("  Corresponds to the LST range of %s to %s" % (lst_start, lst_stop))
     
@@ -223,20 +167,10 @@ def main(args):
     start = start + timedelta(minutes=25)
     
     # Load in the target list
-    ## Read
-    fh = open(_CATALOG_FILENAME, 'r')
-    lines = fh.readlines()
-    fh.close()
-    ## Parse
-    bdys = []
-    for line in lines:
-        line = line.strip().rstrip()
-        if line[0] == '#':
-            continue
-        elif len(line) < 3:
-            continue
-        bdy = Pulsar.from_line(line)
-        bdys.append(bdy)
+    ## Read and parse
+    catalog = _read_catalog(_CATALOG_FILENAME)
+    ## Convert
+    bdys = [Pulsar._from_row(row) for row in catalog.tolist()]
     print('Loaded %i targets' % len(bdys))
     ## Sort the pulsars by hour angle
     #ha_start = lst_start - max([bdy.duration for bdy in bdys])/86400.0*2*numpy.pi
@@ -245,51 +179,59 @@ def main(args):
     #bdys.sort(key=lambda x: ((x._ra - ha_start) if x._ra - ha_start >= 0 else (x._ra - ha_start + 2*numpy.pi)))
     
     # Sort the pulsars by "observability rank"
-    mjd_start, _ = dt2mjd(start)
+    mjd_start, _ = _cached_dt2mjd(start)
     bdys.sort(key=lambda x: x.last_mjd - mjd_start)
     
+    # Find the targets that should be observed given when they were last observed
+    last_mjd = numpy.fromiter((bdy.last_mjd for bdy in bdys), dtype=numpy.int32, count=len(bdys))
+    cadence = numpy.fromiter((bdy.cadence for bdy in bdys), dtype=numpy.int32, count=len(bdys))
+    runnable = (mjd_start >= last_mjd + cadence) & (cadence > 0)
+    bdys_due = [bdys[i] for i in numpy.flatnonzero(runnable)]
+    
+    # Find when each of these targets transits
+    compute_transits(bdys_due, start, obs)
+    
     # Come up a list of objects to observe
     bdys_run = []
+    run_starts_ns, run_stops_ns = [], []    # sorted by start
     rec_secs_allocated = 0.0
-    for bdy in bdys:
+    for bdy in bdys_due:
         ## Is there any space left at this point?
         if bdy.duration >= rec_secs_possible:
             continue
             
-        ## Can/should this target be running?
-        if not bdy.should_run(start, stop):
-            continue
+        ## Can this target be running?
         if not bdy.can_run(start, stop):
             continue
             
         ## Is there a conflict with something that we have previously added to the list?
-        css = bdy.get_start_stop(start, stop)
-        cta = dt2mjd(start)[0] - (bdy.last_mjd + bdy.cadence)
-        conflict = False
-        for prv in bdys_run:
-            pss = prv.get_start_stop(start, stop)
-            pta = dt2mjd(start)[0] - (prv.last_mjd + prv.cadence)
-            if (css[0] >= pss[0] and css[0] <= pss[1]) or (css[1] >= pss[0] and css[1] <= pss[1]) \
-            or (pss[0] >= css[0] and pss[0] <= css[1]) or (pss[1] >= css[0] and pss[1] <= css[1]):
-                conflict = True
-                break
-        if conflict:
+        css_pad = bdy.get_start_stop(start, stop, padding=True)
+        css_nopad = bdy.get_start_stop(start, stop, padding=False)
+        css0, css1 = _datetime_to_ns(css_pad[0]), _datetime_to_ns(css_pad[1])
+        ### Accepted windows never overlap so, once sorted by start, the only one
+        ### that can conflict is the last one to start before this one ends
+        i = bisect_right(run_starts_ns, css1)
+        if i > 0 and run_stops_ns[i-1] >= css0:
             continue
             
         ## Add it to the list
-        bdy.final = bdy.get_start_stop(start, stop, padding=False)
+        bdy.final = css_nopad
+        bdy.final_ns = (_datetime_to_ns(css_nopad[0]), _datetime_to_ns(css_nopad[1]))
+        run_starts_ns.insert(i, css0)
+        run_stops_ns.insert(i, css1)
         bdys_run.append(bdy)
         rec_secs_possible -= bdy.duration
         rec_secs_allocated += bdy.duration
-    bdys_run.sort(key=lambda x: x.final[0])
+    bdys_run.sort(key=lambda x: x.final_ns[0])
     
     # Assign each observation set to beams
-    load = {2:0.0, 3:0.0, 4:0.0}
+    load = numpy.zeros(3, dtype=numpy.float64)    # beams 2, 3, and 4
     for bdy in bdys_run:
-        beams = [lbp[1] for lbp in sorted([(load[b],b) for b in load])]
-        bdy.beams = sorted((beams[0], beams[1]))
-        load[beams[0]] += bdy.duration
-        load[beams[1]] += bdy.duration
+        ## The two least loaded beams, with ties going to the lower beam
+        i,j = numpy.argsort(load, kind='stable')[:2].tolist()
+        bdy.beams = sorted((i+2, j+2))
+        load[i] += bdy.duration
+        load[j] += bdy.duration
         
     # Report
     print("Identified %i targets (%.3f hr) to observe during this window:" % (len(bdys_run), rec_secs_allocated/3600.0))
@@ -298,35 +240,26 @@ def main(args):
                                                        bdy.beams[0], bdy.beams[1]))
         
     # Identify free periods for maintenance scheduling
-    ## Times
-    freeTime = []
-    block_start = start
-    block_stop = stop
-    tFree = block_start + timedelta(seconds=0)
-    while tFree < block_stop:
-        isFree = True
-        for bdy in bdys_run:
-            if tFree < bdy.final[0] - timedelta(minutes=20):
-                pass
-            elif tFree > bdy.final[1] + timedelta(minutes=20):
-                pass
-            else:
-                isFree = False
-                break
-                
-        if isFree:
-            freeTime.append(tFree)
-        tFree = tFree + timedelta(minutes=2)
-    ## Windows
+    ## Times - 2 minute slots that are more than 20 minutes from any observation,
+    ##         worked out in integer nanoseconds since the UNIX epoch
+    block_start = _datetime_to_ns(start)
+    block_stop = _datetime_to_ns(stop)
+    slot = 120 * 10**9
+    margin = 20 * 60 * 10**9
+    n_slots = max(0, -((block_start - block_stop) // slot))
+    free = numpy.ones(n_slots, dtype=bool)
+    for bdy in bdys_run:
+        i0 = max(0, -((block_start - bdy.final_ns[0] + margin) // slot))
+        i1 = min(n_slots, (bdy.final_ns[1] + margin - block_start) // slot + 1)
+        if i0 < i1:
+            free[i0:i1] = False
+    ## Windows - runs of at least two consecutive free slots
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], free.astype(numpy.int8), [0]))))
     freeWindows = []
-    if len(freeTime) > 0:
-        freeWindows.append( [freeTime[0], freeTime[0]] )
-        for tFree in freeTime:
-            if tFree-freeWindows[-1][1] <= timedelta(seconds=120):
-                freeWindows[-1][1] = tFree
-            else:
-                freeWindows.append( [tFree, tFree] )
-        freeWindows = [freeWindow for freeWindow in freeWindows if freeWindow[1]-freeWindow[0] > timedelta()]
+    for i0,i1 in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+        if i1 - i0 > 1:
+            freeWindows.append( [_ns_to_datetime(block_start + i0*slot),
+                                 _ns_to_datetime(block_start + (i1-1)*slot)] )
     print("Free Times:")
     for f0,f1 in freeWindows:
         print(" %s to %s, length %s" % (f0.strftime("%m/%d %H:%M:%S"), f1.strftime("%m/%d %H:%M:%S"), f1-f0))
@@ -334,20 +267,22 @@ def main(args):
     # Indentify busy times
     busyWindows = []
     if len(bdys_run) > 0:
-        busyWindows.append( [bdys_run[0].final[0], bdys_run[0].final[1]] )
+        gap = 45 * 60 * 10**9
+        busyWindows.append( list(bdys_run[0].final_ns) )
         for bdy in bdys_run:
-            tSDFStart, tSDFStop = bdy.final
-            if tSDFStart-busyWindows[-1][1] <= timedelta(minutes=45):
+            tSDFStart, tSDFStop = bdy.final_ns
+            if tSDFStart-busyWindows[-1][1] <= gap:
                 busyWindows[-1][1] = max([busyWindows[-1][1], tSDFStop])
             else:
                 busyWindows.append( [tSDFStart, tSDFStop] )
+        busyWindows = [[_ns_to_datetime(f0), _ns_to_datetime(f1)] for f0,f1 in busyWindows]
     print("BusyTimes:")
     for f0,f1 in busyWindows:
         print(" %s to %s, length %s" % (f0.strftime("%m/%d %H:%M:%S"), f1.strftime("%m/%d %H:%M:%S"), f1-f0))
         
     # Load in the next session ID
     try:
-        fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'), 'r')
+        fh = open(os.path.join(_MODULE_DIR, 'state'), 'r')
         line = fh.read()
         old_project_id, session_id = line.split(None, 1)
         session_id = int(session_id, 10)
@@ -373,23 +308,29 @@ def main(args):
         bdy_start = UTC.localize(bdy_start)
         bdy_stop = UTC.localize(bdy_stop)
         
+        ## Build the project once and then update the beam-specific parts of it
+        ## before rendering each beam
+        targ = lslsdf.DRX(bdy.name, bdy.name, bdy_start, bdy_stop-bdy_start, 
+                          bdy._ra, bdy._dec, 
+                          35.1e6, 49.8e6, 
+                          7, max_snr=False)
+        sess = lslsdf.Session('%s, beam %i' % (bdy.name, bdy.beams[0]), session_id, [targ,])
+        sess.data_return_method = 'UCF'
+        sess.ucf_username = "pulsar/%s/%s" % (_PROJECT_ID, bdy.name)
+        proj = lslsdf.Project(lslobs, _PROJECT_NAME, _PROJECT_ID, [sess,])
+        filebase = '%s_%s' % (proj.id, bdy_start.strftime("%y%m%d_%H%M"))
+        
         for b,beam in enumerate(bdy.beams):
-            targ = lslsdf.DRX(bdy.name, bdy.name, bdy_start, bdy_stop-bdy_start, 
-                              bdy._ra, bdy._dec, 
-                              35.1e6 if b == 0 else 64.5e6, 
-                              49.8e6 if b == 0 else 79.2e6, 
-                              7, max_snr=False)                  
-            sess = lslsdf.Session('%s, beam %i' % (bdy.name, beam), session_id, [targ,])
+            if b != 0:
+                targ.frequency1 = 64.5e6
+                targ.frequency2 = 79.2e6
+                sess.name = '%s, beam %i' % (bdy.name, beam)
+                sess.id = session_id
             sess.drx_beam = beam
-            sess.data_return_method = 'UCF'
-            sess.ucf_username = "pulsar/%s/%s" % (_PROJECT_ID, bdy.name)
-            proj = lslsdf.Project(lslobs, _PROJECT_NAME, _PROJECT_ID, [sess,])
             sdf = proj.render(verbose=False)
             
             if not args.dry_run:
-                filename = '%s_%s_%s_%04d_B%i.sdf' % (proj.id, bdy_start.strftime("%y%m%d"), 
-                                                      bdy_start.strftime("%H%M"), 
-                                                      sess.id, sess.drx_beam)
+                filename = '%s_%04d_B%i.sdf' % (filebase, sess.id, sess.drx_beam)
                 filename = os.path.join(sdf_dir, filename)
                 
                 fh = open(filename, 'w')
@@ -413,7 +354,7 @@ def main(args):
             print("schedule_sdfs() failed with '%s'" % str(scheduling_error))
         bi.stop()
         if not success:
-            fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runtime.log'), 'a')
+            fh = open(os.path.join(_MODULE_DIR, 'runtime.log'), 'a')
             fh.write("Failed Scheduling for UTC %s to %s\n" % (orig_start.strftime('%Y/%m/%d %H:%M:%S'), 
                                                                orig_stop.strftime('%Y/%m/%d %H:%M:%S')))
             fh.write("  Scheduling Error:\n")
@@ -437,39 +378,25 @@ def main(args):
     print("SDFs successfully scheduled")
     if not args.dry_run:
         # Write out new session id
-        fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'), 'w')
+        fh = open(os.path.join(_MODULE_DIR, 'state'), 'w')
         fh.write("%s %i\n" % (_PROJECT_ID, session_id))
         fh.close()
         
         # Update list to get it ready to write back out.  In the process, deal with any 
         # opportunistic targets
+        opts = [opt for opt in bdys if opt.cadence <= 0]
+        opt_ra = numpy.fromiter((opt._ra_rad for opt in opts), dtype=numpy.float64, count=len(opts))
+        opt_dec = numpy.fromiter((opt._dec_rad for opt in opts), dtype=numpy.float64, count=len(opts))
         for bdy in bdys_run:
-            bdy.last_mjd = dt2mjd(bdy.get_start_stop(start, stop, obs)[0])[0]
-            for opt in bdys:
-                if opt.cadence <= 0 and bdy.within_beam(opt):
-                    print("  Note: observation of %s also contains %s" % (bdy.name, opt.name))
-                    opt.last_mjd = bdy.last_mjd
+            bdy.last_mjd = _cached_dt2mjd(bdy.final[0])[0]
+            in_beam = Pulsar.bulk_within_beam(bdy._ra_rad, bdy._dec_rad, opt_ra, opt_dec, 1.5*numpy.pi/180)
+            for i in numpy.flatnonzero(in_beam):
+                opt = opts[i]
+                print("  Note: observation of %s also contains %s" % (bdy.name, opt.name))
+                opt.last_mjd = bdy.last_mjd
 
         # Backup the catalog and write out the new version
-        shutil.copy(_CATALOG_FILENAME, _CATALOG_FILENAME+'.old')
-        fh = open(_CATALOG_FILENAME, 'w')
-        fh.write('############################################\n')
-        fh.write('#                                          #\n')
-        fh.write('# Columns:                                 #\n')
-        fh.write('#   1. Name                                #\n')
-        fh.write('#   2. RA - HH:MM:SS.SS - J2000            #\n')
-        fh.write('#   3. Declination - sDD:MM:SS.S - J2000   #\n')
-        fh.write('#   4. Observation Duration - hours        #\n')
-        fh.write('#   5. Observing Cadence - days            #\n')
-        fh.write('#   6. Last MJD Observed                   #\n')
-        fh.write('#                                          #\n')
-        fh.write('# Updated:                                 #\n')
-        fh.write("#   %s UTC                #\n" % datetime.utcnow().strftime('%Y/%m/%d %H:%M:%S'))
-        fh.write('#                                          #\n')
-        fh.write('############################################\n')
-        for bdy in bdys:
-            bdy.to_file(fh)
-        fh.close()
+        write_catalog(_CATALOG_FILENAME, bdys, backup=True)
         
     print("Scheduling other commands:")
     atCommands = []
@@ -556,14 +483,13 @@ def main(args):
             tTBN = freeWindow[0]
             atCommands.append( (tTBN, '/home/op1/MCS/sch/startTBN_split.sh') )
             
-    ## Implement the commands
-    atIDs = []
-    for cmd in atCommands:
-        if not args.dry_run:
-            atID = schedule_at_command(*cmd)
-        else:
-            atID = -1
-        atIDs.append(atID)
+    ## Implement the commands - each one is a separate call to at so run them
+    ## in parallel
+    if not args.dry_run:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            atIDs = list(pool.map(lambda cmd: schedule_at_command(*cmd), atCommands))
+    else:
+        atIDs = [-1 for cmd in atCommands]
         
     print("Done, saving log")
     if not args.dry_run:
@@ -580,7 +506,7 @@ def main(args):
             rpt.append( [bdy_stop, "%s stops on beams %i and %i" % (bdy.name, bdy.beams[0], bdy.beams[1])] )
         rpt.sort()
     
-        fh = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runtime.log'), 'a')
+        fh = open(os.path.join(_MODULE_DIR, 'runtime.log'), 'a')
         fh.write("Completed Scheduling for UTC %s to %s\n" % (orig_start.strftime('%Y/%m/%d %H:%M:%S'), 
                                                               orig_stop.strftime('%Y/%m/%d %H:%M:%S')))
         fh.write("  Timeline:\n")